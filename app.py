@@ -1,8 +1,12 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, send_file, flash, session, Response
+from flask import Flask, render_template, request, redirect, url_for, jsonify, send_file, flash, session, Response, g
+from werkzeug.local import LocalProxy
 import os
 import json
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import csv
+import gzip
+import re
+import shutil
 import io
 from io import StringIO, BytesIO
 import google.generativeai as genai
@@ -11,11 +15,14 @@ from typing import List, Dict, Any
 import qrcode
 import time
 from random import uniform
-from collections import deque
-from threading import Lock
+from collections import deque, OrderedDict
+from threading import Lock, Thread
+import queue
+import select
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from functools import wraps
+import click
 
 # Load environment variables
 load_dotenv()
@@ -37,11 +44,18 @@ def format_datetime(value):
         print(f"Error formatting datetime: {str(e)}")
         return str(value)
 
-# Initialize Supabase client
-supabase: Client = create_client(
-    os.getenv('SUPABASE_URL'),
-    os.getenv('SUPABASE_KEY')
-)
+# Initialize Supabase client, one per request: check_session sets the user's
+# token on it, and a shared client would hand that token to other requests
+# being served at the same time
+def get_supabase() -> Client:
+    if 'supabase' not in g:
+        g.supabase = create_client(
+            os.getenv('SUPABASE_URL'),
+            os.getenv('SUPABASE_KEY')
+        )
+    return g.supabase
+
+supabase: Client = LocalProxy(get_supabase)
 
 # Configure Gemini API with proper error handling
 try:
@@ -71,6 +85,139 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# In-process pub/sub for the live responses feed
+class ResponseBroadcaster:
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self.subscribers = {}  # form_id -> set of subscriber queues
+        self.lock = Lock()
+
+    def subscribe(self, form_id):
+        subscriber = queue.Queue(maxsize=self.max_queue_size)
+        with self.lock:
+            self.subscribers.setdefault(form_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, form_id, subscriber):
+        with self.lock:
+            form_subscribers = self.subscribers.get(form_id)
+            if form_subscribers is None:
+                return
+            form_subscribers.discard(subscriber)
+            if not form_subscribers:
+                del self.subscribers[form_id]
+
+    def has_subscribers(self, form_id):
+        with self.lock:
+            return bool(self.subscribers.get(form_id))
+
+    def is_subscribed(self, form_id, subscriber):
+        with self.lock:
+            return subscriber in self.subscribers.get(form_id, ())
+
+    def publish(self, form_id, response):
+        # Serialize once and hand the same event to every watcher of the form
+        event = (response['id'], format_response_event(response))
+        with self.lock:
+            form_subscribers = list(self.subscribers.get(form_id, ()))
+
+        for subscriber in form_subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Slow watcher: drop it, the browser reconnects and catches up from its cursor
+                self.unsubscribe(form_id, subscriber)
+
+response_broadcaster = ResponseBroadcaster()
+
+# Cap how long one stream holds a connection; EventSource reconnects
+# on its own and resumes from the Last-Event-ID cursor.
+STREAM_MAX_SECONDS = 25
+STREAM_KEEPALIVE_SECONDS = 10
+
+# The cursor is the database-assigned seq. A seq is taken before its insert
+# commits, so a lower one can become visible after a higher one. Such a row
+# was created while the cursor row's insert was running, so backfill also
+# re-reads the form's rows created up to this long before the cursor row and
+# the page skips repeats. Supabase stops API statements well before this
+# (3s for anon, 8s for authenticated).
+STREAM_LATE_COMMIT_SECONDS = 10
+
+# Columns the app reads back from form_responses (skips the search_vector column)
+RESPONSE_COLUMNS = 'id, form_id, response_data, created_at, seq'
+
+# Cross-process fan-out: each worker LISTENs for the notify_form_response
+# trigger and republishes to its own watchers. This needs a direct Postgres
+# connection (DATABASE_URL); without one only this process's submits are pushed
+# live and other workers' rows arrive through backfill on reconnect.
+DATABASE_URL = os.getenv('DATABASE_URL')
+RESPONSE_NOTIFY_CHANNEL = 'form_responses'
+
+def listen_for_responses(database_url):
+    import psycopg2
+    import psycopg2.extensions
+
+    while True:
+        connection = None
+        try:
+            connection = psycopg2.connect(database_url)
+            connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cursor = connection.cursor()
+            cursor.execute(f'LISTEN {RESPONSE_NOTIFY_CHANNEL}')
+            print("Listening for new form responses")
+
+            while True:
+                if select.select([connection], [], [], 60) == ([], [], []):
+                    continue
+
+                connection.poll()
+                seqs_by_form = {}
+                while connection.notifies:
+                    payload = json.loads(connection.notifies.pop(0).payload)
+                    if response_broadcaster.has_subscribers(payload['form_id']):
+                        seqs_by_form.setdefault(payload['form_id'], []).append(payload['seq'])
+
+                # One read per burst in this process, however many watchers a form has
+                for form_id, seqs in seqs_by_form.items():
+                    cursor.execute(
+                        """SELECT json_build_object('id', id, 'form_id', form_id, 'response_data', response_data,
+                                                 'created_at', created_at, 'seq', seq)
+                           FROM form_responses
+                           WHERE form_id = %s AND seq = ANY(%s)
+                           ORDER BY seq""",
+                        (form_id, seqs)
+                    )
+                    for (response,) in cursor.fetchall():
+                        response_broadcaster.publish(form_id, response)
+        except Exception as e:
+            print(f"Response listener error: {str(e)}")
+            if connection is not None:
+                connection.close()
+            time.sleep(5)
+
+def patch_psycopg_for_gevent():
+    # Under gevent workers, let psycopg2 yield to other greenlets while it waits on the network
+    try:
+        from gevent import monkey
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        return
+    if monkey.is_module_patched('socket'):
+        patch_psycopg()
+
+if DATABASE_URL:
+    patch_psycopg_for_gevent()
+    Thread(target=listen_for_responses, args=(DATABASE_URL,), daemon=True).start()
+
+def format_response_event(response):
+    payload = {
+        'id': response['id'],
+        'seq': response['seq'],
+        'created_at': response['created_at'],
+        'response_data': response['response_data']
+    }
+    return f"id: {response['seq']}\nevent: response\ndata: {json.dumps(payload)}\n\n"
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -427,11 +574,51 @@ def view_form(form_id):
         traceback.print_exc()
         return render_template('error.html', error=f"Error viewing form: {str(e)}")
 
+# Bounded LRU of recently used idempotency keys, checked before the
+# form_response_keys table so retries usually never reach the database
+class IdempotencyCache:
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # (form_id, key) -> response_id
+        self.lock = Lock()
+
+    def get(self, form_id, key):
+        with self.lock:
+            response_id = self.entries.get((form_id, key))
+            if response_id is not None:
+                self.entries.move_to_end((form_id, key))
+            return response_id
+
+    def add(self, form_id, key, response_id):
+        with self.lock:
+            self.entries[(form_id, key)] = response_id
+            self.entries.move_to_end((form_id, key))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+idempotency_cache = IdempotencyCache()
+
+def duplicate_submission(response_id):
+    print(f"Duplicate submission, returning existing response ID: {response_id}")
+    return jsonify({
+        'message': 'Response submitted successfully',
+        'response_id': response_id,
+        'duplicate': True
+    }), 200
+
 @app.route('/submit-response/<form_id>', methods=['POST'])
 def submit_response(form_id):
     try:
         print(f"Attempting to submit response for form {form_id}")
         print(f"Request form data: {request.form}")
+
+        # Only submissions that carry a client key are deduplicated; identical answers
+        # from different people are separate responses. Retries are answered from memory.
+        idempotency_key = request.headers.get('Idempotency-Key', '').strip()[:200] or None
+        if idempotency_key:
+            cached_response_id = idempotency_cache.get(form_id, idempotency_key)
+            if cached_response_id:
+                return duplicate_submission(cached_response_id)
         
         # Get form data from database
         form_response = supabase.table('forms').select('*').eq('id', form_id).execute()
@@ -460,20 +647,19 @@ def submit_response(form_id):
                 print(f"Validation error: {error_msg}")
                 return jsonify({'error': error_msg}), 400
 
-        # Prepare response data
-        current_time = datetime.utcnow().isoformat()
+        # Prepare response data; created_at and seq are assigned by the database
         response_data_to_insert = {
-            'form_id': int(form_id),  # Keep as integer since we created table with bigint
-            'response_data': response_data,
-            'created_at': current_time
+            'p_form_id': int(form_id),  # Keep as integer since we created table with bigint
+            'p_response_data': response_data,
+            'p_idempotency_key': idempotency_key
         }
         
         print(f"Attempting to save response: {response_data_to_insert}")
         
-        # Try to insert the response directly
+        # Insert through submit_form_response so the key check and insert are atomic
         try:
             print("Attempting to insert response...")
-            result = supabase.table('form_responses').insert(response_data_to_insert).execute()
+            result = supabase.rpc('submit_form_response', response_data_to_insert).execute()
             print(f"Insert result: {result}")
             
             if not result.data:
@@ -484,8 +670,16 @@ def submit_response(form_id):
             if not response_id:
                 print("No response ID in result data")
                 return jsonify({'error': 'Failed to get response ID'}), 500
+
+            if idempotency_key:
+                idempotency_cache.add(form_id, idempotency_key, response_id)
+            if result.data[0].get('duplicate'):
+                return duplicate_submission(response_id)
                 
             print(f"Successfully saved response with ID: {response_id}")
+            if not DATABASE_URL:
+                # Otherwise the LISTEN thread publishes it, in every worker
+                response_broadcaster.publish(int(form_id), result.data[0])
             return jsonify({
                 'message': 'Response submitted successfully',
                 'response_id': response_id
@@ -498,7 +692,7 @@ def submit_response(form_id):
             if hasattr(insert_error, '__dict__'):
                 print(f"Insert error details: {insert_error.__dict__}")
             
-            if 'relation "form_responses" does not exist' in error_msg:
+            if 'relation "form_responses" does not exist' in error_msg or 'submit_form_response' in error_msg:
                 return jsonify({'error': 'The form responses table is not set up in the database. Please run the setup SQL first.'}), 500
             elif 'violates foreign key constraint' in error_msg:
                 return jsonify({'error': 'Invalid form ID'}), 400
@@ -525,9 +719,13 @@ def delete_form(form_id):
         if not form.data or form.data['user_id'] != user_id:
             return jsonify({'error': 'Unauthorized to delete this form'}), 403
         
-        # Delete form and its responses
+        # Delete form and its responses, including archived ones
         supabase.table('form_responses').delete().eq('form_id', form_id).execute()
         supabase.table('forms').delete().eq('id', form_id).execute()
+        for month in archived_months():
+            archive_path = os.path.join(RESPONSE_ARCHIVE_DIR, month, f'form_{form_id}.jsonl.gz')
+            if os.path.exists(archive_path):
+                os.remove(archive_path)
         
         return jsonify({'message': 'Form deleted successfully'})
     except Exception as e:
@@ -543,16 +741,155 @@ def view_responses(form_id):
         if not form.data:
             return render_template('error.html', error="Form not found"), 404
 
-        # Get responses
-        responses = supabase.table('form_responses').select('*').eq('form_id', form_id).execute()
+        # Get responses, oldest first so the last row is the live feed cursor
+        responses = hot_responses_query(form_id).order('seq').execute()
+        stream_cursor = responses.data[-1]['seq'] if responses.data else 0
         
         return render_template('responses.html', 
             form=form.data, 
-            responses=responses.data)
+            responses=responses.data,
+            stream_cursor=stream_cursor)
     except Exception as e:
         print(f"Error viewing responses: {str(e)}")
         return render_template('error.html', error="Failed to fetch responses")
 
+@app.route('/forms/<int:form_id>/responses/stream')
+@login_required
+def stream_responses(form_id):
+    # EventSource sends Last-Event-ID when reconnecting, the page passes ?after= on first connect
+    try:
+        cursor = int(request.headers.get('Last-Event-ID') or request.args.get('after') or 0)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    try:
+        form = supabase.table('forms').select('user_id').eq('id', form_id).execute()
+    except Exception as e:
+        print(f"Error streaming responses: {str(e)}")
+        return jsonify({'error': 'Failed to fetch form'}), 500
+    if not form.data:
+        return jsonify({'error': 'Form not found'}), 404
+
+    # Check if user owns this form
+    if str(form.data[0]['user_id']) != session['user']['id']:
+        return jsonify({'error': 'You do not have permission to view these responses'}), 403
+
+    # Subscribe before backfilling so nothing inserted in between is missed
+    subscriber = response_broadcaster.subscribe(form_id)
+    try:
+        backlog_query = supabase.table('form_responses').select(RESPONSE_COLUMNS).eq('form_id', form_id)
+        cursor_rows = []
+        if cursor:
+            cursor_rows = supabase.table('form_responses').select('created_at') \
+                .eq('form_id', form_id).eq('seq', cursor).limit(1).execute().data
+        if cursor_rows:
+            cursor_time = datetime.fromisoformat(cursor_rows[0]['created_at'].replace('Z', '+00:00'))
+            since = cursor_time - timedelta(seconds=STREAM_LATE_COMMIT_SECONDS)
+            backlog_query = backlog_query.or_(f'seq.gt.{cursor},created_at.gte."{since.isoformat()}"').neq('seq', cursor)
+        else:
+            backlog_query = backlog_query.gt('seq', cursor)
+        backlog = backlog_query.order('seq').execute().data
+    except Exception as e:
+        response_broadcaster.unsubscribe(form_id, subscriber)
+        print(f"Error streaming responses: {str(e)}")
+        return jsonify({'error': 'Failed to fetch responses'}), 500
+
+    def generate():
+        sent_ids = set()
+        try:
+            yield "retry: 1000\n\n"
+            for response in backlog:
+                sent_ids.add(response['id'])
+                yield format_response_event(response)
+
+            deadline = time.time() + STREAM_MAX_SECONDS
+            while time.time() < deadline:
+                try:
+                    response_id, event = subscriber.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    if not response_broadcaster.is_subscribed(form_id, subscriber):
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+
+                if response_id in sent_ids:
+                    continue
+                sent_ids.add(response_id)
+                yield event
+        finally:
+            response_broadcaster.unsubscribe(form_id, subscriber)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+SEARCH_MAX_PER_PAGE = 100
+
+@app.route('/forms/<int:form_id>/responses/search')
+@login_required
+def search_responses(form_id):
+    try:
+        query = request.args.get('q', '').strip()
+        field = request.args.get('field') or None
+        after_rank = request.args.get('after_rank', type=float)
+        after_seq = request.args.get('after_seq', type=int)
+        window_before = request.args.get('window_before', type=int)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), SEARCH_MAX_PER_PAGE)
+
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+
+        # Get form details
+        form = supabase.table('forms').select('fields, user_id').eq('id', form_id).single().execute()
+        if not form.data:
+            return jsonify({'error': 'Form not found'}), 404
+
+        # Check if user owns this form
+        if str(form.data['user_id']) != session['user']['id']:
+            return jsonify({'error': 'You do not have permission to view these responses'}), 403
+
+        valid_fields = {f'field_{i}' for i in range(1, len(form.data['fields']) + 1)}
+        if field and field not in valid_fields:
+            return jsonify({'error': f'Unknown field: {field}'}), 400
+
+        # Ask for one extra row to know whether another page exists
+        results = supabase.rpc('search_form_responses', {
+            'p_form_id': form_id,
+            'p_query': query,
+            'p_field': field,
+            'p_limit': per_page + 1,
+            'p_after_rank': after_rank if after_seq is not None else None,
+            'p_after_seq': after_seq if after_rank is not None else None,
+            'p_window_before': window_before
+        }).execute()
+
+        page_results = results.data[:per_page]
+        has_more = len(results.data) > per_page
+
+        # Keyset cursor for the next page: the rank, seq and candidate window of the last row returned
+        next_page = None
+        if has_more:
+            next_page = {
+                'after_rank': page_results[-1]['rank'],
+                'after_seq': page_results[-1]['seq'],
+                'window_before': page_results[-1]['window_before']
+            }
+
+        return jsonify({
+            'results': page_results,
+            'per_page': per_page,
+            'has_more': has_more,
+            'next': next_page
+        })
+    except Exception as e:
+        print(f"Error searching responses: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/forms/<int:form_id>/responses/export')
 @login_required
 def export_responses(form_id):
@@ -562,8 +899,9 @@ def export_responses(form_id):
         if not form.data:
             return jsonify({'error': 'Form not found'}), 404
 
-        # Get responses
-        responses = supabase.table('form_responses').select('*').eq('form_id', form_id).execute()
+        # Archived months come first, then whatever is still in the database
+        responses = list(read_archived_responses(form_id))
+        responses.extend(hot_responses_query(form_id).order('seq').execute().data)
         
         # Create CSV data
         output = io.StringIO()
@@ -576,7 +914,7 @@ def export_responses(form_id):
         writer.writerow(headers)
         
         # Write response data
-        for response in responses.data:
+        for response in responses:
             row = [response['id'], response['created_at']]
             response_data = response['response_data']
             for i, _ in enumerate(form.data['fields'], 1):
@@ -597,6 +935,128 @@ def export_responses(form_id):
         print(f"Error exporting responses: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# Cold storage for form_responses partitions older than RESPONSE_HOT_MONTHS.
+# Each archived month is a directory of gzipped JSON-lines files, one per form.
+RESPONSE_ARCHIVE_DIR = os.getenv('RESPONSE_ARCHIVE_DIR', 'archive')
+RESPONSE_HOT_MONTHS = int(os.getenv('RESPONSE_HOT_MONTHS', '12'))
+ARCHIVE_PAGE_SIZE = 1000
+
+def add_months(month_start, months):
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def archived_months():
+    if not os.path.isdir(RESPONSE_ARCHIVE_DIR):
+        return []
+    return sorted(name for name in os.listdir(RESPONSE_ARCHIVE_DIR) if re.fullmatch(r'\d{4}_\d{2}', name))
+
+def read_archived_responses(form_id):
+    for month in archived_months():
+        archive_path = os.path.join(RESPONSE_ARCHIVE_DIR, month, f'form_{form_id}.jsonl.gz')
+        if not os.path.exists(archive_path):
+            continue
+        with gzip.open(archive_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+def hot_responses_query(form_id):
+    # form_id picks one hash sub-partition per month; the created_at bound
+    # lets Postgres skip months that are already archived.
+    query = supabase.table('form_responses').select(RESPONSE_COLUMNS).eq('form_id', form_id)
+    months = archived_months()
+    if months:
+        year, month = map(int, months[-1].split('_'))
+        query = query.gte('created_at', add_months(date(year, month, 1), 1).isoformat())
+    return query
+
+def count_archived_responses(month_dir):
+    count = 0
+    for name in os.listdir(month_dir):
+        with gzip.open(os.path.join(month_dir, name), 'rt', encoding='utf-8') as f:
+            count += sum(1 for _ in f)
+    return count
+
+def archive_responses_month(client, month_start):
+    month_dir = os.path.join(RESPONSE_ARCHIVE_DIR, month_start.strftime('%Y_%m'))
+    month_end = add_months(month_start, 1)
+
+    # Pulls any of the month's rows out of the default partition, so dropping the month removes them all
+    client.rpc('create_form_responses_partition', {'p_month': month_start.isoformat()}).execute()
+
+    month_rows = client.table('form_responses').select('id', count='exact') \
+        .gte('created_at', month_start.isoformat()).lt('created_at', month_end.isoformat()) \
+        .limit(1).execute().count
+
+    if not os.path.isdir(month_dir):
+        # Write into a temporary directory so a half-written month is never read
+        tmp_dir = month_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        # Walk the whole month once by seq and split each page by form while writing.
+        # Appending adds a gzip member per page; gzip.open reads them back as one stream.
+        # Pages can come back shorter than asked (PostgREST max_rows), so only an empty one ends the month.
+        last_seq = 0
+        while True:
+            page = client.table('form_responses').select(RESPONSE_COLUMNS) \
+                .gte('created_at', month_start.isoformat()).lt('created_at', month_end.isoformat()) \
+                .gt('seq', last_seq).order('seq').limit(ARCHIVE_PAGE_SIZE).execute().data
+            if not page:
+                break
+
+            responses_by_form = {}
+            for response in page:
+                responses_by_form.setdefault(response['form_id'], []).append(response)
+            for form_id, responses in responses_by_form.items():
+                with gzip.open(os.path.join(tmp_dir, f'form_{form_id}.jsonl.gz'), 'at', encoding='utf-8') as f:
+                    for response in responses:
+                        f.write(json.dumps(response) + '\n')
+
+            last_seq = page[-1]['seq']
+
+        os.rename(tmp_dir, month_dir)
+    elif month_rows == 0:
+        # Archived on an earlier run; only the empty partition was created again
+        client.rpc('drop_form_responses_partition', {'p_month': month_start.isoformat()}).execute()
+        return
+
+    # Only drop the partition once the archive holds every one of its rows
+    archived = count_archived_responses(month_dir)
+    if archived != month_rows:
+        raise click.ClickException(
+            f"Archive {month_dir} holds {archived} responses but the database has {month_rows} "
+            f"for {month_start.strftime('%Y-%m')}; partition kept"
+        )
+
+    client.rpc('drop_form_responses_partition', {'p_month': month_start.isoformat()}).execute()
+    client.table('form_response_keys').delete().lt('created_at', month_end.isoformat()).execute()
+
+@app.cli.command('archive-responses')
+def archive_responses_command():
+    """Move form_responses partitions older than RESPONSE_HOT_MONTHS into local archive files."""
+    # Creating and dropping partitions is restricted to the service role
+    service_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    if not service_key:
+        raise click.ClickException('SUPABASE_SERVICE_ROLE_KEY must be set to archive responses')
+    client = create_client(os.getenv('SUPABASE_URL'), service_key)
+
+    # Keep partitions ahead of new inserts so they never pile up in the default partition
+    client.rpc('ensure_form_responses_partitions', {'p_months_ahead': 3}).execute()
+
+    cutoff = add_months(date.today().replace(day=1), -RESPONSE_HOT_MONTHS)
+
+    oldest = client.table('form_responses').select('created_at').order('created_at').limit(1).execute()
+    if not oldest.data:
+        print("No responses to archive")
+        return
+
+    created_at = oldest.data[0]['created_at']
+    month = date(int(created_at[:4]), int(created_at[5:7]), 1)
+    while month < cutoff:
+        archive_responses_month(client, month)
+        print(f"Archived responses for {month.strftime('%Y-%m')}")
+        month = add_months(month, 1)
+
 # Rate limiter for AI generation
 class RateLimiter:
     def __init__(self, max_requests=60, time_window=60):  # 60 requests per minute by default
@@ -647,17 +1107,121 @@ def generate_with_backoff(prompt, max_retries=3, initial_delay=1):
         else:
             raise e
 
-@app.route('/generate-form', methods=['POST'])
-def generate_form():
-    try:
-        data = request.json
-        description = data.get('description', '')
-        
-        if not description:
-            return jsonify({'error': 'Description is required'}), 400
-            
-        # Generate form structure using AI
-        prompt = f"""Create a form structure based on this description: {description}
+def stream_with_backoff(prompt, max_retries=3, initial_delay=1):
+    # Only retry before the first chunk; after that the caller has already used the output
+    delay = initial_delay
+    for attempt in range(max_retries + 1):
+        started = False
+        try:
+            for chunk in model.generate_content(prompt, stream=True):
+                started = True
+                yield chunk.text
+            return
+        except Exception:
+            if started or attempt == max_retries:
+                raise
+            time.sleep(delay * (1 + uniform(-0.1, 0.1)))  # Add some jitter
+            delay *= 2
+
+# Incremental parser for the model's JSON array of fields. Each top-level
+# object is handed back as soon as its closing brace arrives, so anything
+# before the array (like a ```json fence) or a broken tail is ignored, and
+# so is anything after the array's closing bracket.
+class FieldStreamParser:
+    def __init__(self):
+        self.buffer = ''
+        self.position = 0
+        self.depth = 0
+        self.object_start = None
+        self.in_array = False
+        self.finished = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text):
+        if self.finished:
+            return []
+
+        self.buffer += text
+        objects = []
+
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            if not self.in_array:
+                self.in_array = char == '['
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == ']' and self.depth == 0:
+                self.finished = True
+                self.buffer = ''
+                self.position = 0
+                return objects
+            elif char == '{':
+                if self.depth == 0:
+                    self.object_start = self.position
+                self.depth += 1
+            elif char == '}' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    objects.append(self.buffer[self.object_start:self.position + 1])
+                    self.object_start = None
+            self.position += 1
+
+        # Drop text that has been fully consumed
+        keep_from = self.object_start if self.object_start is not None else self.position
+        self.buffer = self.buffer[keep_from:]
+        self.position -= keep_from
+        if self.object_start is not None:
+            self.object_start = 0
+
+        return objects
+
+def validate_generated_field(field, index):
+    required_keys = {'id', 'label', 'type', 'required'}
+    if not isinstance(field, dict) or not all(key in field for key in required_keys):
+        raise ValueError(f"Field missing required keys: {required_keys}")
+
+    # Ensure unique ID
+    if not field['id']:
+        field['id'] = f"field_{index}"
+
+    for key in ('id', 'label', 'type'):
+        if not isinstance(field[key], str):
+            raise ValueError(f"Field {key} must be a string")
+
+    # Ensure options are present for certain field types
+    if field['type'] in {'select', 'radio', 'checkbox'}:
+        if 'options' not in field or not isinstance(field['options'], list):
+            field['options'] = ['Option 1', 'Option 2', 'Option 3']
+
+    # Ensure proper boolean value for required
+    field['required'] = bool(field['required'])
+
+    return field
+
+def parse_generated_fields(chunks):
+    # Yield each valid field as soon as it is complete, skipping malformed ones
+    parser = FieldStreamParser()
+    index = 0
+    for chunk in chunks:
+        for object_text in parser.feed(chunk):
+            try:
+                field = validate_generated_field(json.loads(object_text), index + 1)
+            except (json.JSONDecodeError, ValueError) as e:
+                print(f"Skipping invalid generated field: {str(e)}\nField was: {object_text}")
+                continue
+            index += 1
+            yield field
+
+def build_form_prompt(description):
+    return f"""Create a form structure based on this description: {description}
         
         Return ONLY a JSON array of form fields, with each field having these properties:
         - id: string (unique identifier like 'field_1', 'field_2', etc.)
@@ -678,52 +1242,67 @@ def generate_form():
         2. Make sure all fields have unique IDs
         3. Include options array only for select, radio, and checkbox types
         4. Keep the response focused and relevant to: {description}"""
+
+@app.route('/generate-form', methods=['POST'])
+def generate_form():
+    try:
+        data = request.json
+        description = data.get('description', '')
         
-        response = generate_with_backoff(prompt)
-        
-        try:
-            # Clean the response to ensure it's valid JSON
-            response_text = response.strip()
-            # Remove any markdown code block indicators if present
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-            
-            # Parse the JSON
-            fields = json.loads(response_text)
-            
-            # Validate the response structure
-            if not isinstance(fields, list):
-                raise ValueError("Response must be a JSON array")
-            
-            # Validate each field
-            for field in fields:
-                required_keys = {'id', 'label', 'type', 'required'}
-                if not all(key in field for key in required_keys):
-                    raise ValueError(f"Field missing required keys: {required_keys}")
-                
-                # Ensure options are present for certain field types
-                if field['type'] in {'select', 'radio', 'checkbox'}:
-                    if 'options' not in field or not isinstance(field['options'], list):
-                        field['options'] = ['Option 1', 'Option 2', 'Option 3']
-                
-                # Ensure proper boolean value for required
-                field['required'] = bool(field['required'])
-                
-                # Ensure unique ID
-                if not field['id']:
-                    field['id'] = f"field_{fields.index(field) + 1}"
+        if not description:
+            return jsonify({'error': 'Description is required'}), 400
             
-            return jsonify({'fields': fields})
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {str(e)}\nResponse was: {response_text}")
+        # Generate form structure using AI
+        response = generate_with_backoff(build_form_prompt(description))
+        
+        fields = list(parse_generated_fields([response]))
+        if not fields:
+            print(f"No valid fields in AI response: {response}")
             return jsonify({'error': 'Invalid AI response format'}), 500
-        except ValueError as e:
-            print(f"Validation error: {str(e)}\nResponse was: {response_text}")
-            return jsonify({'error': str(e)}), 500
+        
+        return jsonify({'fields': fields})
             
     except Exception as e:
         print(f"Error generating form: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/generate-form/stream', methods=['POST'])
+def generate_form_stream():
+    data = request.json
+    description = data.get('description', '') if data else ''
+
+    if not description:
+        return jsonify({'error': 'Description is required'}), 400
+
+    prompt = build_form_prompt(description)
+
+    # One JSON object per line: {"field": ...} for each field, then {"done": ...} or {"error": ...}
+    def generate():
+        count = 0
+        try:
+            for field in parse_generated_fields(stream_with_backoff(prompt)):
+                count += 1
+                yield json.dumps({'field': field}) + '\n'
+        except Exception as e:
+            print(f"Error streaming generated form: {str(e)}")
+            if not count:
+                yield json.dumps({'error': str(e)}) + '\n'
+                return
+
+        if count:
+            yield json.dumps({'done': True, 'count': count}) + '\n'
+        else:
+            yield json.dumps({'error': 'Invalid AI response format'}) + '\n'
+
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/forms/<int:form_id>/share')
 def share_form(form_id):
     try:
@@ -0,0 +1,127 @@
+"""Benchmark the form response search index.
+
+Loads a synthetic form with N responses, times a rebuild of
+idx_form_responses_search and reports p50/p95 latency of
+search_form_responses() for free-text and per-field queries.
+
+Run it against a disposable database that has setup.sql applied; it drops
+and rebuilds the search index:
+
+    DATABASE_URL=postgresql://... python benchmarks/search_benchmark.py --responses 1000000
+"""
+import argparse
+import os
+import statistics
+import time
+
+import psycopg2
+
+# Word i is drawn with probability falling off steeply with i, so w0 is in
+# most responses and the high words are rare.
+VOCABULARY_SIZE = 2000
+BATCH_SIZE = 100000
+
+QUERIES = [
+    ('common term', 'w0', None),
+    ('medium term', 'w40', None),
+    ('rare term', 'w1500', None),
+    ('two terms', 'w0 w3', None),
+    ('phrase', '"w0 w1"', None),
+    ('per-field common', 'w0', 'field_2'),
+    ('per-field rare', 'w1500', 'field_2'),
+    ('per-field phrase', '"w0 w1"', 'field_2'),
+]
+
+def random_words(count):
+    word = f"'w' || floor({VOCABULARY_SIZE} * power(random(), 3))::int"
+    return " || ' ' || ".join([word] * count)
+
+def load_responses(cursor, form_id, total):
+    inserted = 0
+    while inserted < total:
+        batch = min(BATCH_SIZE, total - inserted)
+        cursor.execute(
+            f"""INSERT INTO form_responses (form_id, response_data)
+                SELECT %s, jsonb_build_object(
+                    'field_1', {random_words(6)},
+                    'field_2', {random_words(3)},
+                    'field_3', CASE WHEN random() < 0.5 THEN 'yes' ELSE 'no' END
+                )
+                FROM generate_series(1, %s)""",
+            (form_id, batch)
+        )
+        inserted += batch
+        print(f"Inserted {inserted}/{total} responses")
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--responses', type=int, default=200000)
+    parser.add_argument('--runs', type=int, default=50, help='timed runs per query')
+    parser.add_argument('--keep', action='store_true', help='keep the benchmark form afterwards')
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error('Set DATABASE_URL or pass --database-url')
+
+    connection = psycopg2.connect(args.database_url)
+    connection.autocommit = True
+    cursor = connection.cursor()
+
+    cursor.execute(
+        "INSERT INTO forms (user_id, title, fields) VALUES (uuid_generate_v4(), 'Search benchmark', '[]') RETURNING id"
+    )
+    form_id = cursor.fetchone()[0]
+
+    try:
+        started = time.perf_counter()
+        load_responses(cursor, form_id, args.responses)
+        print(f"Loaded {args.responses} responses in {time.perf_counter() - started:.1f}s")
+
+        cursor.execute("SELECT pg_get_indexdef('idx_form_responses_search'::regclass)")
+        # The stored definition of a partitioned index uses ON ONLY, which would skip the partitions
+        index_definition = cursor.fetchone()[0].replace(' ON ONLY ', ' ON ')
+        cursor.execute("SELECT count(*) FROM form_responses")
+        total_rows = cursor.fetchone()[0]
+
+        cursor.execute("DROP INDEX idx_form_responses_search")
+        started = time.perf_counter()
+        cursor.execute(index_definition)
+        print(f"Built idx_form_responses_search over {total_rows} rows in {time.perf_counter() - started:.2f}s")
+        cursor.execute("ANALYZE form_responses")
+
+        print()
+        print(f"{'query':<20} {'matches':>10} {'returned':>10} {'p50 ms':>10} {'p95 ms':>10}")
+        for name, query, field in QUERIES:
+            cursor.execute(
+                """SELECT count(*)
+                   FROM form_responses, websearch_to_tsquery('simple', %s) q
+                   WHERE form_id = %s
+                     AND search_vector @@ CASE WHEN %s::text IS NULL THEN q
+                                               ELSE form_response_field_query(q, %s) END""",
+                (query, form_id, field, field)
+            )
+            matches = cursor.fetchone()[0]
+
+            samples = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                cursor.execute(
+                    "SELECT * FROM search_form_responses(%s, %s, %s, 21)",
+                    (form_id, query, field)
+                )
+                returned = len(cursor.fetchall())
+                samples.append((time.perf_counter() - started) * 1000)
+
+            print(f"{name:<20} {matches:>10} {returned:>10} {statistics.median(samples):>10.2f} {percentile(samples, 0.95):>10.2f}")
+    finally:
+        if not args.keep:
+            cursor.execute("DELETE FROM forms WHERE id = %s", (form_id,))
+        connection.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+-- form_responses: table, partitions, functions, grants and indexes.
+-- Included by setup.sql and migrate_partition_responses.sql (run them with
+-- psql so the include resolves); expects the forms table to exist.
+
+-- Search document for a response: every string value, plus the same words
+-- tagged with their field key ('field_2:word') so per-field searches use the
+-- index too. Tagged words keep their positions within the field, so phrase
+-- and proximity queries work per field as well.
+CREATE OR REPLACE FUNCTION form_response_search_vector(p_data jsonb)
+RETURNS tsvector
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT jsonb_to_tsvector('simple', p_data, '["string"]')
+        || coalesce((
+               SELECT string_agg(
+                          regexp_replace(jsonb_to_tsvector('simple', f.value, '["string"]')::text,
+                                         '''((?:[^'']|'''')+)''', '''' || f.key || ':\1''', 'g'),
+                          ' ')
+               FROM jsonb_each(p_data) f
+               WHERE f.key ~ '^\w+$'
+           ), '')::tsvector;
+$$;
+
+-- Rewrite a query to match only words tagged with the given field key
+CREATE OR REPLACE FUNCTION form_response_field_query(p_query tsquery, p_field text)
+RETURNS tsquery
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT regexp_replace(p_query::text, '''((?:[^'']|'''')+)''', '''' || p_field || ':\1''', 'g')::tsquery;
+$$;
+
+-- Database-assigned, ever increasing response number; the live feed resumes from it
+CREATE SEQUENCE form_responses_seq;
+
+-- Create form_responses table, range partitioned by month of created_at
+CREATE TABLE form_responses (
+    id uuid DEFAULT uuid_generate_v4() NOT NULL,
+    form_id bigint NOT NULL,
+    response_data jsonb NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    seq bigint NOT NULL DEFAULT nextval('form_responses_seq'),
+    -- Full-text search document, see form_response_search_vector()
+    search_vector tsvector GENERATED ALWAYS AS (
+        form_response_search_vector(response_data)
+    ) STORED,
+    -- Every partitioning column (created_at, then form_id) has to be part of the primary key
+    PRIMARY KEY (id, created_at, form_id),
+    CONSTRAINT fk_form
+        FOREIGN KEY (form_id)
+        REFERENCES forms(id)
+        ON DELETE CASCADE
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE form_responses_seq OWNED BY form_responses.seq;
+
+-- Announce every new response so each app worker can push it to its live feed watchers
+CREATE OR REPLACE FUNCTION notify_form_response()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('form_responses', json_build_object('form_id', NEW.form_id, 'seq', NEW.seq)::text);
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER form_responses_notify
+    AFTER INSERT ON form_responses
+    FOR EACH ROW EXECUTE FUNCTION notify_form_response();
+
+-- Catch rows that fall outside the created monthly partitions
+CREATE TABLE form_responses_default PARTITION OF form_responses DEFAULT;
+
+-- Create a monthly form_responses partition, sub-partitioned by form_id hash
+-- so a single form's rows for the month live in one small table.
+-- Rows for the month that already landed in the default partition would
+-- block the new partition, so they are moved into it.
+CREATE OR REPLACE FUNCTION create_form_responses_partition(p_month date)
+RETURNS text
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    month_start date := date_trunc('month', p_month)::date;
+    month_end date := (date_trunc('month', p_month) + interval '1 month')::date;
+    partition_name text := format('form_responses_%s', to_char(month_start, 'YYYY_MM'));
+    hash_partitions integer := 8;
+    has_default_rows boolean;
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    SELECT EXISTS (
+        SELECT 1 FROM form_responses_default
+        WHERE created_at >= month_start AND created_at < month_end
+    ) INTO has_default_rows;
+
+    IF has_default_rows THEN
+        CREATE TEMP TABLE form_responses_moving ON COMMIT DROP AS
+        SELECT id, form_id, response_data, created_at, seq
+        FROM form_responses_default
+        WHERE created_at >= month_start AND created_at < month_end;
+
+        DELETE FROM form_responses_default
+        WHERE created_at >= month_start AND created_at < month_end;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF form_responses
+             FOR VALUES FROM (%L) TO (%L)
+             PARTITION BY HASH (form_id)',
+        partition_name, month_start, month_end
+    );
+
+    FOR i IN 0..hash_partitions - 1 LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I
+                 FOR VALUES WITH (MODULUS %s, REMAINDER %s)',
+            partition_name || '_' || i, partition_name, hash_partitions, i
+        );
+    END LOOP;
+
+    IF has_default_rows THEN
+        INSERT INTO form_responses (id, form_id, response_data, created_at, seq)
+        SELECT id, form_id, response_data, created_at, seq FROM form_responses_moving;
+        DROP TABLE form_responses_moving;
+    END IF;
+
+    RETURN partition_name;
+END;
+$$;
+
+-- Make sure partitions exist for the current month and the next few.
+-- `flask archive-responses` calls this on every run, so schedule that command.
+CREATE OR REPLACE FUNCTION ensure_form_responses_partitions(p_months_ahead integer DEFAULT 3)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    FOR i IN 0..p_months_ahead LOOP
+        PERFORM create_form_responses_partition((now() + make_interval(months => i))::date);
+    END LOOP;
+END;
+$$;
+
+-- Drop a month's partition once the archive job has written it to disk
+CREATE OR REPLACE FUNCTION drop_form_responses_partition(p_month date)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    EXECUTE format(
+        'DROP TABLE IF EXISTS %I',
+        format('form_responses_%s', to_char(date_trunc('month', p_month), 'YYYY_MM'))
+    );
+END;
+$$;
+
+-- These run as the table owner, so only the service role may call them
+REVOKE EXECUTE ON FUNCTION create_form_responses_partition(date) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION ensure_form_responses_partitions(integer) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION drop_form_responses_partition(date) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION create_form_responses_partition(date) TO service_role;
+GRANT EXECUTE ON FUNCTION ensure_form_responses_partitions(integer) TO service_role;
+GRANT EXECUTE ON FUNCTION drop_form_responses_partition(date) TO service_role;
+
+-- Idempotency keys for submissions, so client retries map back to the first response
+CREATE TABLE IF NOT EXISTS form_response_keys (
+    form_id bigint NOT NULL REFERENCES forms(id) ON DELETE CASCADE,
+    idempotency_key text NOT NULL,
+    response_id uuid,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (form_id, idempotency_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_form_response_keys_created_at ON form_response_keys(created_at);
+
+-- Insert a response unless its idempotency key was already used for this form.
+-- Duplicates get the original response_id back and write nothing.
+DROP FUNCTION IF EXISTS submit_form_response(bigint, jsonb, text, timestamptz);
+CREATE OR REPLACE FUNCTION submit_form_response(
+    p_form_id bigint,
+    p_response_data jsonb,
+    p_idempotency_key text DEFAULT NULL
+)
+RETURNS TABLE (
+    id uuid,
+    form_id bigint,
+    response_data jsonb,
+    created_at timestamptz,
+    seq bigint,
+    duplicate boolean
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    new_id uuid;
+    new_created_at timestamptz;
+    new_seq bigint;
+BEGIN
+    IF p_idempotency_key IS NOT NULL THEN
+        -- A concurrent request with the same key waits here until the first one commits
+        INSERT INTO form_response_keys (form_id, idempotency_key)
+        VALUES (p_form_id, p_idempotency_key)
+        ON CONFLICT DO NOTHING;
+
+        IF NOT FOUND THEN
+            RETURN QUERY
+            SELECT k.response_id, k.form_id, NULL::jsonb, k.created_at, NULL::bigint, true
+            FROM form_response_keys k
+            WHERE k.form_id = p_form_id AND k.idempotency_key = p_idempotency_key;
+            RETURN;
+        END IF;
+    END IF;
+
+    INSERT INTO form_responses (form_id, response_data)
+    VALUES (p_form_id, p_response_data)
+    RETURNING form_responses.id, form_responses.created_at, form_responses.seq
+    INTO new_id, new_created_at, new_seq;
+
+    IF p_idempotency_key IS NOT NULL THEN
+        UPDATE form_response_keys k
+        SET response_id = new_id
+        WHERE k.form_id = p_form_id AND k.idempotency_key = p_idempotency_key;
+    END IF;
+
+    RETURN QUERY SELECT new_id, p_form_id, p_response_data, new_created_at, new_seq, false;
+END;
+$$;
+
+GRANT ALL ON form_response_keys TO authenticated;
+GRANT ALL ON form_response_keys TO service_role;
+GRANT EXECUTE ON FUNCTION submit_form_response(bigint, jsonb, text) TO anon;
+GRANT EXECUTE ON FUNCTION submit_form_response(bigint, jsonb, text) TO authenticated;
+GRANT EXECUTE ON FUNCTION submit_form_response(bigint, jsonb, text) TO service_role;
+
+SELECT ensure_form_responses_partitions(3);
+
+-- Grant permissions
+GRANT ALL ON form_responses TO authenticated;
+GRANT ALL ON form_responses TO service_role;
+
+-- Create indexes for faster lookups
+CREATE INDEX idx_form_responses_form_id ON form_responses(form_id, seq);
+CREATE INDEX idx_form_responses_seq ON form_responses(seq);
+CREATE INDEX idx_form_responses_search ON form_responses USING GIN (form_id, search_vector);
+
+-- Ranked, paginated full-text search over a form's responses.
+-- p_field narrows the match to a single field key such as 'field_2'.
+-- Matches are ranked in windows of the newest p_max_candidates, so common
+-- terms stay fast on large forms; once a window is used up the search moves
+-- on to the next older one. Pages continue after (p_after_rank, p_after_seq)
+-- in window p_window_before, the window_before of the last row returned.
+DROP FUNCTION IF EXISTS search_form_responses(bigint, text, text, integer, integer);
+DROP FUNCTION IF EXISTS search_form_responses(bigint, text, text, integer, real, bigint, integer);
+CREATE OR REPLACE FUNCTION search_form_responses(
+    p_form_id bigint,
+    p_query text,
+    p_field text DEFAULT NULL,
+    p_limit integer DEFAULT 20,
+    p_after_rank real DEFAULT NULL,
+    p_after_seq bigint DEFAULT NULL,
+    p_window_before bigint DEFAULT NULL,
+    p_max_candidates integer DEFAULT 1000
+)
+RETURNS TABLE (
+    id uuid,
+    form_id bigint,
+    response_data jsonb,
+    created_at timestamptz,
+    seq bigint,
+    rank real,
+    window_before bigint
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    q tsquery := websearch_to_tsquery('simple', p_query);
+    current_window bigint := p_window_before;
+    after_rank real := p_after_rank;
+    after_seq bigint := p_after_seq;
+    remaining integer := p_limit;
+    returned integer;
+    window_size integer;
+    window_oldest bigint;
+BEGIN
+    IF p_field IS NOT NULL THEN
+        q := form_response_field_query(q, p_field);
+    END IF;
+
+    LOOP
+        RETURN QUERY
+        WITH candidates AS (
+            SELECT r.id, r.form_id, r.response_data, r.created_at, r.seq,
+                   ts_rank(r.search_vector, q) AS rank
+            FROM form_responses r
+            WHERE r.form_id = p_form_id
+              AND r.search_vector @@ q
+              AND (current_window IS NULL OR r.seq < current_window)
+            ORDER BY r.seq DESC
+            LIMIT p_max_candidates
+        )
+        SELECT c.id, c.form_id, c.response_data, c.created_at, c.seq, c.rank, current_window
+        FROM candidates c
+        WHERE after_seq IS NULL
+           OR (c.rank, c.seq) < (after_rank, after_seq)
+        ORDER BY c.rank DESC, c.seq DESC
+        LIMIT remaining;
+
+        GET DIAGNOSTICS returned = ROW_COUNT;
+        remaining := remaining - returned;
+        EXIT WHEN remaining <= 0;
+
+        -- This window is used up; a full one means older matches remain
+        SELECT count(*), min(w.seq) INTO window_size, window_oldest
+        FROM (
+            SELECT r.seq
+            FROM form_responses r
+            WHERE r.form_id = p_form_id
+              AND r.search_vector @@ q
+              AND (current_window IS NULL OR r.seq < current_window)
+            ORDER BY r.seq DESC
+            LIMIT p_max_candidates
+        ) w;
+        EXIT WHEN window_size = 0 OR window_size < p_max_candidates;
+
+        current_window := window_oldest;
+        after_rank := NULL;
+        after_seq := NULL;
+    END LOOP;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION search_form_responses(bigint, text, text, integer, real, bigint, bigint, integer) TO authenticated;
+GRANT EXECUTE ON FUNCTION search_form_responses(bigint, text, text, integer, real, bigint, bigint, integer) TO service_role;
@@ -0,0 +1,36 @@
+-- Migrate an existing unpartitioned form_responses table to the
+-- partitioned layout from setup.sql and add the submission idempotency keys.
+-- Run once with psql, inside a maintenance window.
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+-- Move the old table and its index names out of the way
+ALTER TABLE form_responses RENAME TO form_responses_unpartitioned;
+ALTER INDEX IF EXISTS form_responses_pkey RENAME TO form_responses_unpartitioned_pkey;
+ALTER INDEX IF EXISTS idx_form_responses_form_id RENAME TO idx_form_responses_unpartitioned_form_id;
+ALTER INDEX IF EXISTS idx_form_responses_search RENAME TO idx_form_responses_unpartitioned_search;
+
+\ir form_responses.sql
+
+-- Create a partition for every month that already has responses
+SELECT create_form_responses_partition(month::date)
+FROM generate_series(
+    date_trunc('month', (SELECT coalesce(min(created_at), now()) FROM form_responses_unpartitioned)),
+    date_trunc('month', now()),
+    interval '1 month'
+) AS month;
+
+-- Copy without announcing every migrated row to the live feed
+ALTER TABLE form_responses DISABLE TRIGGER form_responses_notify;
+
+INSERT INTO form_responses (id, form_id, response_data, created_at)
+SELECT id, form_id, response_data, coalesce(created_at, now())
+FROM form_responses_unpartitioned
+ORDER BY created_at;
+
+ALTER TABLE form_responses ENABLE TRIGGER form_responses_notify;
+
+DROP TABLE form_responses_unpartitioned;
+
+COMMIT;
@@ -18,7 +18,9 @@ if [ ! -f .env ]; then
     cat > .env << EOL
 SUPABASE_URL=your_supabase_url
 SUPABASE_KEY=your_supabase_anon_key
+SUPABASE_SERVICE_ROLE_KEY=your_supabase_service_role_key
 GOOGLE_API_KEY=your_google_api_key
+DATABASE_URL=your_postgres_connection_string
 FLASK_SECRET_KEY=$(python -c 'import secrets; print(secrets.token_hex(32))')
 EOL
     echo "Created .env file. Please update it with your actual credentials."
@@ -1,7 +1,11 @@
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Enable btree_gin so form_id can share a GIN index with the search vector
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
 -- Drop existing tables with CASCADE to handle dependencies
+DROP TABLE IF EXISTS form_response_keys CASCADE;
 DROP TABLE IF EXISTS form_responses CASCADE;
 DROP TABLE IF EXISTS responses CASCADE;
 DROP TABLE IF EXISTS forms CASCADE;
@@ -18,24 +22,12 @@ CREATE TABLE forms (
     updated_at timestamptz DEFAULT now()
 );
 
--- Create form_responses table
-CREATE TABLE form_responses (
-    id uuid DEFAULT uuid_generate_v4() PRIMARY KEY,
-    form_id bigint NOT NULL,
-    response_data jsonb NOT NULL,
-    created_at timestamptz DEFAULT now(),
-    CONSTRAINT fk_form
-        FOREIGN KEY (form_id)
-        REFERENCES forms(id)
-        ON DELETE CASCADE
-);
+-- Create form_responses with its partitions, functions and indexes
+\ir form_responses.sql
 
 -- Grant permissions
 GRANT ALL ON forms TO authenticated;
 GRANT ALL ON forms TO service_role;
-GRANT ALL ON form_responses TO authenticated;
-GRANT ALL ON form_responses TO service_role;
 
 -- Create indexes for faster lookups
 CREATE INDEX idx_forms_user_id ON forms(user_id);
-CREATE INDEX idx_form_responses_form_id ON form_responses(form_id); 
\ No newline at end of file
@@ -321,7 +321,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
             try {
                 showLoading('Generating form with AI...');
-                const response = await fetch('/generate-form', {
+                const response = await fetch('/generate-form/stream', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'
@@ -329,20 +329,49 @@ document.addEventListener('DOMContentLoaded', function() {
                     body: JSON.stringify({ description })
                 });
 
-                const data = await response.json();
-                hideLoading();
-
                 if (!response.ok) {
+                    const data = await response.json();
                     throw new Error(data.error || 'Failed to generate form');
                 }
 
-                // Clear existing fields
-                document.getElementById('fields-container').innerHTML = '';
+                // Fields arrive one JSON object per line; render each as soon as it is complete
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                let fieldCount = 0;
+
+                const handleLine = (line) => {
+                    if (!line.trim()) return;
+                    const message = JSON.parse(line);
+                    if (message.error) {
+                        throw new Error(message.error);
+                    }
+                    if (message.field) {
+                        if (fieldCount === 0) {
+                            // Clear existing fields once the first generated one is ready
+                            hideLoading();
+                            document.getElementById('fields-container').innerHTML = '';
+                        }
+                        fieldCount++;
+                        this.addFieldToUI(message.field);
+                    }
+                };
 
-                // Add generated fields
-                data.fields.forEach(field => {
-                    this.addFieldToUI(field);
-                });
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+
+                    buffer += decoder.decode(value, { stream: true });
+                    const lines = buffer.split('\n');
+                    buffer = lines.pop();
+                    lines.forEach(handleLine);
+                }
+                handleLine(buffer);
+
+                hideLoading();
+                if (fieldCount === 0) {
+                    throw new Error('Failed to generate form');
+                }
 
                 showSuccess('Form generated successfully!');
             } catch (error) {
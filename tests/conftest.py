@@ -0,0 +1,11 @@
+import os
+import sys
+
+# app.py builds its clients at import time; point them somewhere harmless
+os.environ.setdefault('SUPABASE_URL', 'http://localhost:54321')
+os.environ.setdefault('SUPABASE_KEY', 'test-key')
+os.environ.setdefault('GOOGLE_API_KEY', 'test-key')
+# Keep the LISTEN thread off; tests publish through the in-process broadcaster
+os.environ['DATABASE_URL'] = ''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,107 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import click
+import pytest
+
+import app
+
+MONTH = date(2025, 1, 1)
+
+def make_response(seq, form_id):
+    created_at = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=seq)
+    return {'id': f'response-{seq}', 'form_id': form_id, 'response_data': {'field_1': str(seq)},
+            'created_at': created_at.isoformat(), 'seq': seq}
+
+class FakeQuery:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.rows = list(client.rows) if name == 'form_responses' else []
+        self.row_limit = None
+        self.count = None
+
+    def select(self, columns, count=None):
+        self.count = count
+        return self
+
+    def gte(self, column, value):
+        self.rows = [row for row in self.rows if row[column] >= value]
+        return self
+
+    def lt(self, column, value):
+        self.rows = [row for row in self.rows if row[column] < value]
+        return self
+
+    def gt(self, column, value):
+        self.rows = [row for row in self.rows if row[column] > value]
+        return self
+
+    def order(self, column):
+        self.rows.sort(key=lambda row: row[column])
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def delete(self):
+        self.client.calls.append(f'delete {self.name}')
+        return self
+
+    def execute(self):
+        # PostgREST caps every page at max_rows, whatever limit was asked for
+        page = self.rows[:min(self.row_limit or len(self.rows), self.client.max_rows)]
+        return SimpleNamespace(data=page, count=len(self.rows) + self.client.extra_count if self.count else None)
+
+class FakeClient:
+    def __init__(self, rows, max_rows=1000, extra_count=0):
+        self.rows = rows
+        self.max_rows = max_rows
+        self.extra_count = extra_count
+        self.calls = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        self.calls.append(name)
+        return SimpleNamespace(execute=lambda: None)
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'RESPONSE_ARCHIVE_DIR', str(tmp_path))
+    return tmp_path
+
+def test_archive_reads_past_short_pages(archive_dir):
+    rows = [make_response(seq, form_id=seq % 3) for seq in range(1, 2501)]
+    client = FakeClient(rows, max_rows=250)
+
+    app.archive_responses_month(client, MONTH)
+
+    archived = [response for form_id in range(3) for response in app.read_archived_responses(form_id)]
+    assert sorted(response['seq'] for response in archived) == list(range(1, 2501))
+    assert [response['seq'] for response in app.read_archived_responses(1)][:3] == [1, 4, 7]
+    assert client.calls == ['create_form_responses_partition', 'drop_form_responses_partition',
+                            'delete form_response_keys']
+
+def test_archive_keeps_partition_when_counts_differ(archive_dir):
+    client = FakeClient([make_response(seq, form_id=1) for seq in range(1, 11)], extra_count=1)
+
+    with pytest.raises(click.ClickException, match='holds 10 responses but the database has 11'):
+        app.archive_responses_month(client, MONTH)
+
+    assert 'drop_form_responses_partition' not in client.calls
+
+def test_archive_skips_writing_a_month_already_on_disk(archive_dir):
+    rows = [make_response(seq, form_id=1) for seq in range(1, 11)]
+    app.archive_responses_month(FakeClient(rows), MONTH)
+
+    # The partition was dropped, so running again finds the month empty
+    client = FakeClient([])
+    app.archive_responses_month(client, MONTH)
+
+    assert len(list(app.read_archived_responses(1))) == 10
+    assert client.calls == ['create_form_responses_partition', 'drop_form_responses_partition']
+    assert os.listdir(archive_dir) == ['2025_01']
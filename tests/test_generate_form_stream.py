@@ -0,0 +1,112 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+FIELDS = [
+    {'id': 'field_1', 'label': 'Full Name', 'type': 'text', 'required': True},
+    {'id': 'field_2', 'label': 'Say "hi" {or} [not]', 'type': 'textarea', 'required': False},
+    {'id': 'field_3', 'label': 'Plan', 'type': 'select', 'required': True, 'options': ['Free', 'Pro']},
+    {'id': 'field_4', 'label': 'Email', 'type': 'email', 'required': True},
+    {'id': 'field_5', 'label': 'Topics', 'type': 'checkbox', 'required': False, 'options': ['a', 'b']},
+    {'id': 'field_6', 'label': 'Notes', 'type': 'textarea', 'required': False},
+]
+MODEL_OUTPUT = '```json\n' + json.dumps(FIELDS, indent=2) + '\n```'
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def parse(chunks):
+    return list(app.parse_generated_fields(chunks))
+
+class SlowModel:
+    """Returns MODEL_OUTPUT in small chunks with a delay before each, like Gemini streaming."""
+
+    def __init__(self, text, chunk_size=40, delay=0.02):
+        self.chunks = chunked(text, chunk_size)
+        self.delay = delay
+
+    def generate_content(self, prompt, stream=False):
+        if not stream:
+            time.sleep(self.delay * len(self.chunks))
+            return SimpleNamespace(text=''.join(self.chunks))
+        return self.stream()
+
+    def stream(self):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield SimpleNamespace(text=chunk)
+
+@pytest.mark.parametrize('chunk_size', [1, 7, len(MODEL_OUTPUT)])
+def test_parser_handles_fences_and_string_contents(chunk_size):
+    # Quotes, braces and brackets inside labels must not end an object early
+    assert parse(chunked(MODEL_OUTPUT, chunk_size)) == FIELDS
+
+def test_parser_handles_escaped_backslash_before_quote():
+    text = '[{"id": "a", "label": "C:\\\\", "type": "text", "required": true}]'
+    assert parse(chunked(text, 1))[0]['label'] == 'C:\\'
+
+def test_parser_ignores_truncated_tail():
+    text = json.dumps(FIELDS[:2])[:-1] + ', {"id": "field_3", "label": "Cut o'
+    assert parse(chunked(text, 5)) == FIELDS[:2]
+
+@pytest.mark.parametrize('chunk_size', [1, 9])
+def test_parser_stops_at_end_of_array(chunk_size):
+    example = '{"id": "field_9", "label": "Example", "type": "text", "required": false}'
+    text = json.dumps(FIELDS[:2]) + '\n\nFor example: ' + example + '\n[' + example + ']'
+    assert parse(chunked(text, chunk_size)) == FIELDS[:2]
+
+def test_parser_skips_invalid_fields():
+    text = json.dumps([
+        {'id': 'a', 'label': 'Kept', 'type': 'text', 'required': True},
+        {'id': 'b', 'label': 'List type', 'type': ['text'], 'required': True},
+        {'id': 'c', 'label': 'No type', 'required': True},
+        {'id': 'd', 'label': 42, 'type': 'text', 'required': True},
+        {'id': '', 'label': 'Missing options', 'type': 'radio', 'required': 0},
+    ])
+    fields = parse([text])
+
+    assert [field['label'] for field in fields] == ['Kept', 'Missing options']
+    assert fields[1]['id'] == 'field_2'
+    assert fields[1]['options'] == ['Option 1', 'Option 2', 'Option 3']
+    assert fields[1]['required'] is False
+
+def read_stream(client):
+    started = time.perf_counter()
+    response = client.post('/generate-form/stream', json={'description': 'signup'}, buffered=False)
+    lines = []
+    first_line_at = None
+    buffer = ''
+    for data in response.response:
+        buffer += data.decode('utf-8') if isinstance(data, bytes) else data
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            if first_line_at is None:
+                first_line_at = time.perf_counter() - started
+            lines.append(json.loads(line))
+    response.close()
+    return first_line_at, lines
+
+def test_stream_sends_first_field_before_full_response(monkeypatch):
+    monkeypatch.setattr(app, 'model', SlowModel(MODEL_OUTPUT))
+    client = app.app.test_client()
+
+    started = time.perf_counter()
+    full = client.post('/generate-form', json={'description': 'signup'})
+    full_seconds = time.perf_counter() - started
+
+    first_line_seconds, lines = read_stream(client)
+
+    assert full.get_json() == {'fields': FIELDS}
+    assert lines == [{'field': field} for field in FIELDS] + [{'done': True, 'count': len(FIELDS)}]
+    assert first_line_seconds < full_seconds / 3
+
+def test_stream_reports_unusable_output(monkeypatch):
+    monkeypatch.setattr(app, 'model', SlowModel('Sorry, I cannot help with that.', delay=0))
+
+    _, lines = read_stream(app.app.test_client())
+
+    assert lines == [{'error': 'Invalid AI response format'}]
@@ -0,0 +1,188 @@
+import json
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Thread
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+FORMS = [{'id': 1, 'user_id': 'owner'}, {'id': 2, 'user_id': 'owner'}]
+
+def make_response(seq, form_id=1, seconds=None):
+    # Rows a minute apart by default, so only deliberate ones fall in the late-commit window
+    created_at = START + timedelta(seconds=seq * 60 if seconds is None else seconds)
+    return {'id': f'response-{seq}', 'form_id': form_id, 'response_data': {'field_1': f'answer {seq}'},
+            'created_at': created_at.isoformat(), 'seq': seq}
+
+def comparable(column, value):
+    if column == 'created_at':
+        return datetime.fromisoformat(str(value).strip('"'))
+    if column == 'seq':
+        return int(value)
+    return str(value)
+
+OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'neq': lambda a, b: a != b,
+    'gt': lambda a, b: a > b,
+    'gte': lambda a, b: a >= b,
+}
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.row_limit = None
+
+    def where(self, column, operator, value):
+        self.rows = [row for row in self.rows
+                     if OPERATORS[operator](comparable(column, row[column]), comparable(column, value))]
+        return self
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return self.where(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self.where(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self.where(column, 'gt', value)
+
+    def or_(self, filters):
+        conditions = re.findall(r'(\w+)\.(\w+)\.("[^"]*"|[^,]*)', filters)
+        self.rows = [row for row in self.rows
+                     if any(OPERATORS[operator](comparable(column, row[column]), comparable(column, value))
+                            for column, operator, value in conditions)]
+        return self
+
+    def order(self, column):
+        self.rows.sort(key=lambda row: row[column])
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.rows[:self.row_limit])
+
+class FakeSupabase:
+    def __init__(self, responses):
+        self.tables = {'forms': FORMS, 'form_responses': responses}
+
+    def table(self, name):
+        return FakeQuery(self.tables[name])
+
+@pytest.fixture
+def broadcaster(monkeypatch):
+    broadcaster = app.ResponseBroadcaster()
+    monkeypatch.setattr(app, 'response_broadcaster', broadcaster)
+    monkeypatch.setattr(app, 'STREAM_MAX_SECONDS', 0.3)
+    monkeypatch.setattr(app, 'STREAM_KEEPALIVE_SECONDS', 0.05)
+    return broadcaster
+
+@pytest.fixture
+def responses(monkeypatch):
+    responses = [make_response(seq) for seq in range(1, 6)] + [make_response(100, form_id=2)]
+    monkeypatch.setattr(app, 'supabase', FakeSupabase(responses))
+    return responses
+
+def login(client, user_id='owner'):
+    with client.session_transaction() as session:
+        session['user'] = {'id': user_id, 'email': 'owner@example.com', 'access_token': None}
+    return client
+
+def read_events(response):
+    text = b''.join(response.response).decode('utf-8')
+    response.close()
+    return [json.loads(block.split('data: ', 1)[1]) for block in text.split('\n\n') if 'event: response' in block]
+
+def stream(client, after=None, last_event_id=None):
+    url = '/forms/1/responses/stream' + (f'?after={after}' if after is not None else '')
+    headers = {'Last-Event-ID': str(last_event_id)} if last_event_id is not None else {}
+    return client.get(url, headers=headers, buffered=False)
+
+def test_publish_fans_out_to_every_subscriber_of_the_form():
+    broadcaster = app.ResponseBroadcaster()
+    watchers = [broadcaster.subscribe(1) for _ in range(3)]
+    other_form = broadcaster.subscribe(2)
+
+    broadcaster.publish(1, make_response(1))
+
+    events = [watcher.get_nowait() for watcher in watchers]
+    assert events[0][0] == 'response-1'
+    assert all(event is events[0] for event in events)
+    assert other_form.empty()
+
+def test_full_subscriber_is_dropped():
+    broadcaster = app.ResponseBroadcaster(max_queue_size=1)
+    slow = broadcaster.subscribe(1)
+    fast = broadcaster.subscribe(1)
+
+    broadcaster.publish(1, make_response(1))
+    fast.get_nowait()
+    broadcaster.publish(1, make_response(2))
+
+    assert not broadcaster.is_subscribed(1, slow)
+    assert broadcaster.is_subscribed(1, fast)
+    assert slow.get_nowait()[0] == 'response-1'
+    assert fast.get_nowait()[0] == 'response-2'
+
+def test_unsubscribing_last_watcher_forgets_the_form():
+    broadcaster = app.ResponseBroadcaster()
+    watcher = broadcaster.subscribe(1)
+    broadcaster.unsubscribe(1, watcher)
+
+    assert not broadcaster.has_subscribers(1)
+
+def test_stream_resumes_after_cursor(broadcaster, responses):
+    events = read_events(stream(login(app.app.test_client()), after=3))
+
+    assert [event['seq'] for event in events] == [4, 5]
+    assert not broadcaster.has_subscribers(1)
+
+def test_last_event_id_takes_precedence_over_after(broadcaster, responses):
+    events = read_events(stream(login(app.app.test_client()), after=1, last_event_id=4))
+
+    assert [event['seq'] for event in events] == [5]
+
+def test_stream_backfills_late_commit_behind_cursor(broadcaster, responses):
+    # seq 2 was taken before seq 3 but its insert committed after the page read seq 3
+    responses[1] = make_response(2, seconds=3 * 60 - 1)
+
+    events = read_events(stream(login(app.app.test_client()), after=3))
+
+    assert [event['seq'] for event in events] == [2, 4, 5]
+
+def test_stream_skips_events_already_sent(broadcaster, responses):
+    def publish_when_subscribed():
+        while not broadcaster.has_subscribers(1):
+            time.sleep(0.01)
+        # The LISTEN thread can deliver a row the backfill already read
+        broadcaster.publish(1, responses[4])
+        broadcaster.publish(1, make_response(6))
+        broadcaster.publish(1, make_response(6))
+
+    publisher = Thread(target=publish_when_subscribed)
+    publisher.start()
+    events = read_events(stream(login(app.app.test_client()), after=4))
+    publisher.join()
+
+    assert [event['seq'] for event in events] == [5, 6]
+
+def test_stream_rejects_invalid_cursor(broadcaster, responses):
+    response = stream(login(app.app.test_client()), after='abc')
+
+    assert response.status_code == 400
+
+def test_stream_is_only_for_the_form_owner(broadcaster, responses):
+    response = stream(login(app.app.test_client(), user_id='someone-else'), after=0)
+
+    assert response.status_code == 403
+    assert not broadcaster.has_subscribers(1)
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+FORM = {'id': 1, 'user_id': 'owner', 'fields': [{'type': 'text', 'label': 'Name'}]}
+
+class FakeQuery:
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def single(self):
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=FORM)
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def table(self, name):
+        return FakeQuery()
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=self.rows[:params['p_limit']]))
+
+def result(seq, rank=0.5, window_before=None):
+    return {'id': f'response-{seq}', 'form_id': 1, 'response_data': {'field_1': 'red car'},
+            'created_at': '2025-01-01T00:00:00+00:00', 'seq': seq, 'rank': rank, 'window_before': window_before}
+
+def login(client, user_id='owner'):
+    with client.session_transaction() as session:
+        session['user'] = {'id': user_id, 'email': 'owner@example.com', 'access_token': None}
+    return client
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    # The last rows come from the next older candidate window
+    fake = FakeSupabase([result(seq) for seq in range(30, 27, -1)] + [result(seq, window_before=28) for seq in (10, 9)])
+    monkeypatch.setattr(app, 'supabase', fake)
+    return fake
+
+def test_next_page_carries_the_candidate_window(fake_supabase):
+    client = login(app.app.test_client())
+
+    first = client.get('/forms/1/responses/search?q=red&per_page=4').get_json()
+
+    assert [row['seq'] for row in first['results']] == [30, 29, 28, 10]
+    assert first['has_more'] is True
+    assert first['next'] == {'after_rank': 0.5, 'after_seq': 10, 'window_before': 28}
+
+    client.get('/forms/1/responses/search', query_string={'q': 'red', 'per_page': 4, **first['next']})
+
+    params = fake_supabase.calls[-1][1]
+    assert (params['p_after_rank'], params['p_after_seq'], params['p_window_before']) == (0.5, 10, 28)
+
+def test_last_page_has_no_cursor(fake_supabase):
+    data = login(app.app.test_client()).get('/forms/1/responses/search?q=red&per_page=20').get_json()
+
+    assert len(data['results']) == 5
+    assert data['has_more'] is False
+    assert data['next'] is None
+
+def test_search_is_only_for_the_form_owner(fake_supabase):
+    response = login(app.app.test_client(), user_id='someone-else').get('/forms/1/responses/search?q=red')
+
+    assert response.status_code == 403
+    assert not fake_supabase.calls
+
+def test_search_rejects_unknown_field(fake_supabase):
+    response = login(app.app.test_client()).get('/forms/1/responses/search?q=red&field=field_9')
+
+    assert response.status_code == 400
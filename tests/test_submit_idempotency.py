@@ -0,0 +1,165 @@
+import uuid
+from datetime import datetime, timezone
+from threading import Barrier, Lock, Thread
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+FORM = {
+    'id': 1,
+    'title': 'Feedback',
+    'fields': [
+        {'type': 'text', 'label': 'Name', 'required': True},
+        {'type': 'checkbox', 'label': 'Topics', 'options': ['a', 'b']},
+    ],
+}
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, *args):
+        return self
+
+    def eq(self, column, value):
+        self.rows = [row for row in self.rows if str(row[column]) == str(value)]
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.rows)
+
+class FakeSupabase:
+    """Stands in for the Supabase client, with submit_form_response behaving like the SQL function."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.keys = {}  # (form_id, key) -> response_id
+        self.inserts = []
+
+    def table(self, name):
+        assert name == 'forms'
+        return FakeQuery([FORM])
+
+    def rpc(self, name, params):
+        assert name == 'submit_form_response'
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=[self.submit(**params)]))
+
+    def submit(self, p_form_id, p_response_data, p_idempotency_key=None):
+        # The key row and the response are written in one transaction in the database
+        with self.lock:
+            key = (p_form_id, p_idempotency_key)
+            if p_idempotency_key is not None and key in self.keys:
+                return {'id': self.keys[key], 'form_id': p_form_id, 'response_data': None,
+                        'created_at': None, 'seq': None, 'duplicate': True}
+
+            response = {
+                'id': str(uuid.uuid4()),
+                'form_id': p_form_id,
+                'response_data': p_response_data,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'seq': len(self.inserts) + 1,
+                'duplicate': False,
+            }
+            self.inserts.append(response)
+            if p_idempotency_key is not None:
+                self.keys[key] = response['id']
+            return response
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(app, 'supabase', fake)
+    return fake
+
+# A zero-sized cache forgets every key, so each retry reaches the database path
+@pytest.fixture(params=[10000, 0], ids=['cache', 'no-cache'])
+def cache(request, monkeypatch):
+    cache = app.IdempotencyCache(max_size=request.param)
+    monkeypatch.setattr(app, 'idempotency_cache', cache)
+    return cache
+
+def submit(client, key=None, name='Ada'):
+    headers = {'Idempotency-Key': key} if key else {}
+    return client.post('/submit-response/1', data={'field_1': name, 'field_2[]': ['a']}, headers=headers)
+
+def test_sequential_retries_insert_once(fake_supabase, cache):
+    client = app.app.test_client()
+
+    results = [submit(client, key='key-1') for _ in range(5)]
+
+    assert all(result.status_code == 200 for result in results)
+    assert len(fake_supabase.inserts) == 1
+    assert {result.get_json()['response_id'] for result in results} == {fake_supabase.inserts[0]['id']}
+    assert 'duplicate' not in results[0].get_json()
+    assert all(result.get_json()['duplicate'] for result in results[1:])
+
+def test_concurrent_retries_insert_once(fake_supabase, cache):
+    attempts = 16
+    barrier = Barrier(attempts)
+    results = [None] * attempts
+
+    def send(i):
+        client = app.app.test_client()
+        barrier.wait()
+        results[i] = submit(client, key='key-1')
+
+    threads = [Thread(target=send, args=(i,)) for i in range(attempts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(result.status_code == 200 for result in results)
+    assert len(fake_supabase.inserts) == 1
+    assert {result.get_json()['response_id'] for result in results} == {fake_supabase.inserts[0]['id']}
+
+def test_different_keys_insert_separately(fake_supabase, cache):
+    client = app.app.test_client()
+
+    first = submit(client, key='key-1')
+    second = submit(client, key='key-2')
+
+    assert len(fake_supabase.inserts) == 2
+    assert first.get_json()['response_id'] != second.get_json()['response_id']
+
+def test_identical_submissions_without_key_are_kept(fake_supabase, cache):
+    client = app.app.test_client()
+
+    results = [submit(client) for _ in range(3)]
+
+    assert all(result.status_code == 200 for result in results)
+    assert len(fake_supabase.inserts) == 3
+    assert all(insert['id'] for insert in fake_supabase.inserts)
+    assert not fake_supabase.keys
+
+def test_invalid_submission_does_not_record_key(fake_supabase, cache):
+    client = app.app.test_client()
+
+    rejected = submit(client, key='key-1', name='')
+    accepted = submit(client, key='key-1')
+
+    assert rejected.status_code == 400
+    assert accepted.status_code == 200
+    assert 'duplicate' not in accepted.get_json()
+    assert len(fake_supabase.inserts) == 1
+
+def test_idempotency_cache_evicts_least_recently_used():
+    cache = app.IdempotencyCache(max_size=2)
+    cache.add('1', 'a', 'response-a')
+    cache.add('1', 'b', 'response-b')
+
+    assert cache.get('1', 'a') == 'response-a'  # a is now the most recent
+    cache.add('1', 'c', 'response-c')
+
+    assert cache.get('1', 'b') is None
+    assert cache.get('1', 'a') == 'response-a'
+    assert cache.get('1', 'c') == 'response-c'
+
+def test_idempotency_cache_keys_are_per_form():
+    cache = app.IdempotencyCache(max_size=10)
+    cache.add('1', 'a', 'response-1')
+
+    assert cache.get('2', 'a') is None
+    assert cache.get('1', 'a') == 'response-1'